@@ -10,6 +10,9 @@ class Config:
     def __init__(self, config_file: str = "config.yaml"):
         self.config_file = config_file
         self.config: Dict[str, Any] = self._load_config()
+        # Dotted key -> value for every node, so get() is a single dict lookup
+        self._flat: Dict[str, Any] = {}
+        self._flatten(self.config)
 
     def _load_config(self) -> Dict[str, Any]:
         """Load configuration from YAML file"""
@@ -24,6 +27,14 @@ class Config:
             print(f"Error loading config file: {e}. Using default config.")
             return self._get_default_config()
 
+    def _flatten(self, value: Any, prefix: str = ''):
+        """Record value and every nested value under their dotted keys"""
+        if prefix:
+            self._flat[prefix] = value
+        if isinstance(value, dict):
+            for k, v in value.items():
+                self._flatten(v, f"{prefix}.{k}" if prefix else str(k))
+
     def _get_default_config(self) -> Dict[str, Any]:
         """Get default configuration"""
         return {
@@ -32,7 +43,15 @@ class Config:
                 'max_pages': 10,
                 'timeout': 30,
                 'retry_times': 3,
-                'delay': 1.0
+                'delay': 1.0,
+                'concurrency': 10,
+                'rate': 5,
+                'chunk_size': 65536
+            },
+            'cache': {
+                'enabled': True,
+                'path': 'cache.db',
+                'ttl': 86400
             },
             'proxy': {
                 'enabled': False,
@@ -55,25 +74,23 @@ class Config:
 
     def get(self, key: str, default: Any = None) -> Any:
         """Get configuration value by key (supports dot notation)"""
-        keys = key.split('.')
-        value = self.config
-
-        for k in keys:
-            if isinstance(value, dict) and k in value:
-                value = value[k]
-            else:
-                return default
-
-        return value
+        return self._flat.get(key, default)
 
     def set(self, key: str, value: Any):
         """Set configuration value by key (supports dot notation)"""
         keys = key.split('.')
         config = self.config
 
-        for k in keys[:-1]:
+        for i, k in enumerate(keys[:-1]):
             if k not in config:
                 config[k] = {}
+                self._flat['.'.join(keys[:i + 1])] = config[k]
             config = config[k]
 
         config[keys[-1]] = value
+
+        # Drop entries of the subtree being replaced, then record the new value
+        subtree = key + '.'
+        for k in [k for k in self._flat if k.startswith(subtree)]:
+            del self._flat[k]
+        self._flatten(value, key)
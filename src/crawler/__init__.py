@@ -1,4 +1,5 @@
 from .pixiv_api import PixivAPI
 from .downloader import PixivDownloader
+from .http import build_session
 
-__all__ = ['PixivAPI', 'PixivDownloader']
+__all__ = ['PixivAPI', 'PixivDownloader', 'build_session']
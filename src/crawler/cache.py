@@ -0,0 +1,78 @@
+import sqlite3
+import time
+from typing import Dict, Optional
+from src.utils.logger import Logger
+
+try:
+    import orjson as json
+except ImportError:  # Fall back to the stdlib parser
+    import json
+
+
+class DetailCache:
+    """On-disk cache of illustration details keyed by illustration ID"""
+
+    def __init__(self, path: str = 'cache.db', ttl: int = 86400):
+        self.path = path
+        self.ttl = ttl
+        self.logger = Logger()
+        self.conn: Optional[sqlite3.Connection] = None
+        self._disabled = False
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        """Open the database on first use, disabling the cache if that fails"""
+        if self.conn is None and not self._disabled:
+            try:
+                conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+                conn.execute(
+                    'CREATE TABLE IF NOT EXISTS details(id INTEGER PRIMARY KEY, payload BLOB, ts INTEGER)'
+                )
+                self.conn = conn
+            except sqlite3.Error as e:
+                self.logger.warning("Detail cache disabled, cannot open %s: %s", self.path, e)
+                self._disabled = True
+        return self.conn
+
+    def get(self, illust_id: int) -> Optional[Dict]:
+        """
+        Get cached details for an illustration
+
+        Args:
+            illust_id: Pixiv illustration ID
+
+        Returns:
+            Cached illustration details, or None if missing or expired
+        """
+        conn = self._connect()
+        if conn is None:
+            return None
+
+        try:
+            row = conn.execute(
+                'SELECT payload FROM details WHERE id = ? AND ts > ?',
+                (illust_id, int(time.time()) - self.ttl)
+            ).fetchone()
+            return json.loads(row[0]) if row else None
+        except (sqlite3.Error, ValueError) as e:
+            self.logger.warning("Failed to read cached details for illust_id %s: %s", illust_id, e)
+            return None
+
+    def put(self, illust_id: int, details: Dict):
+        """Store details for an illustration"""
+        conn = self._connect()
+        if conn is None:
+            return
+
+        try:
+            conn.execute(
+                'INSERT OR REPLACE INTO details VALUES (?, ?, ?)',
+                (illust_id, json.dumps(details), int(time.time()))
+            )
+        except sqlite3.Error as e:
+            self.logger.warning("Failed to cache details for illust_id %s: %s", illust_id, e)
+
+    def close(self):
+        """Close the database connection if it was opened"""
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
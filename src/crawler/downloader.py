@@ -1,49 +1,53 @@
 import os
-import requests
+import sys
+import asyncio
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import httpx
+import aiofiles
+from aiolimiter import AsyncLimiter
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Tuple
 from tqdm import tqdm
-import time
 from src.utils.logger import Logger
 from src.config.config import Config
+from src.crawler.http import build_headers, get_proxy
+
+# Characters that are not allowed in file names on Windows
+_SANITIZE = str.maketrans({c: '_' for c in '/\\:*?"<>|'})
+
+# Windows and macOS file systems ignore case in file names by default
+_CASE_INSENSITIVE = sys.platform in ('win32', 'darwin')
+
+
+def _name_key(name: str) -> str:
+    """Normalize a file name the way the platform compares them"""
+    return name.casefold() if _CASE_INSENSITIVE else name
 
 
 class PixivDownloader:
     """Download illustrations from Pixiv"""
 
+    ACCEPT = 'image/webp,image/apng,image/svg+xml,image/*,*/*;q=0.8'
+
     def __init__(self, config: Config):
         self.config = config
         self.logger = Logger()
-        self.session = requests.Session()
-        self._setup_session()
+        self.headers = {**build_headers(config), 'Accept': self.ACCEPT}
+        self._proxy = get_proxy(config)
+        self._timeout = config.get('download.timeout', 30)
+        self._rate = config.get('download.rate', 5)
+        if self._rate <= 0:
+            raise ValueError(f"download.rate must be positive, got {self._rate}")
+        self._chunk = config.get('download.chunk_size', 1 << 16)
         self.output_dir = Path(config.get('download.output_dir', './downloads'))
         self.output_dir.mkdir(parents=True, exist_ok=True)
-
-    def _setup_session(self):
-        """Setup requests session with headers and proxies"""
-        headers = {
-            'User-Agent': self.config.get('headers.user_agent', ''),
-            'Referer': 'https://www.pixiv.net',
-            'Accept': 'image/webp,image/apng,image/svg+xml,image/*,*/*;q=0.8',
-            'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
-        }
-        self.session.headers.update(headers)
-
-        # Setup proxy if enabled
-        if self.config.get('proxy.enabled', False):
-            http_proxy = self.config.get('proxy.http')
-            https_proxy = self.config.get('proxy.https')
-            if http_proxy or https_proxy:
-                proxies = {}
-                if http_proxy:
-                    proxies['http'] = http_proxy
-                if https_proxy:
-                    proxies['https'] = https_proxy
-                self.session.proxies.update(proxies)
+        # Names already in output_dir, so skip checks don't stat every file
+        self._existing = {_name_key(entry.name) for entry in os.scandir(self.output_dir)}
 
     def download_illustrations(self, illustrations: List[Dict]) -> Dict[str, int]:
         """
-        Download illustrations
+        Download illustrations concurrently
 
         Args:
             illustrations: List of illustration dictionaries
@@ -51,95 +55,130 @@ class PixivDownloader:
         Returns:
             Dictionary containing download statistics
         """
-        stats = {
-            'total': len(illustrations),
-            'success': 0,
-            'failed': 0,
-            'skipped': 0
-        }
-
-        for illust in tqdm(illustrations, desc="Downloading illustrations"):
-            try:
-                result = self.download_single_illustration(illust)
-                if result == 'success':
-                    stats['success'] += 1
-                elif result == 'skipped':
-                    stats['skipped'] += 1
-                else:
-                    stats['failed'] += 1
-            except Exception as e:
-                self.logger.error(f"Error downloading illustration {illust.get('id')}: {e}")
-                stats['failed'] += 1
-
-        return stats
+        return asyncio.run(self._download_illustrations_async(illustrations))
+
+    async def _download_illustrations_async(self, illustrations: List[Dict]) -> Dict[str, int]:
+        """Download all images of all illustrations over one shared HTTP/2 client"""
+        # Flatten every page of every illustration into one task list
+        targets = []
+        owners = []
+        for illust in illustrations:
+            illust_targets = self._build_targets(illust)
+            if not illust_targets:
+                self.logger.warning(f"No image URLs found for illustration {illust.get('id')}")
+            targets.extend(illust_targets)
+            owners.append(len(illust_targets))
+
+        concurrency = self.config.get('download.concurrency', 10)
+        sem = asyncio.Semaphore(concurrency)
+        # Token bucket: at most download.rate requests per second, bursts allowed.
+        # AsyncLimiter needs a whole token per acquire, so slower rates stretch the period
+        if self._rate >= 1:
+            limiter = AsyncLimiter(self._rate, 1)
+        else:
+            limiter = AsyncLimiter(1, 1 / self._rate)
+        # Enough connections for every slot in case HTTP/2 is not negotiated
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        # The semaphore already bounds waiting for a connection, so don't time it out
+        timeout = httpx.Timeout(self._timeout, pool=None)
+
+        # File writes run on their own threads so they neither stall the event
+        # loop nor queue behind other work on the default executor
+        disk = ThreadPoolExecutor(max_workers=4, thread_name_prefix='disk')
+
+        with disk, tqdm(total=len(targets), desc="Downloading illustrations") as pbar:
+            # HTTP/2 multiplexes the downloads over a few connections per host
+            async with httpx.AsyncClient(
+                http2=True,
+                limits=limits,
+                timeout=timeout,
+                headers=self.headers,
+                proxy=self._proxy
+            ) as client:
+                async def run(url: str, file_path: Path):
+                    try:
+                        return await self._download_one(client, sem, limiter, disk, url, file_path)
+                    finally:
+                        pbar.update(1)
+
+                results = await asyncio.gather(
+                    *(run(url, file_path) for url, file_path in targets),
+                    return_exceptions=True
+                )
 
-    def download_single_illustration(self, illust: Dict) -> str:
-        """
-        Download a single illustration
+        # Fold per-image results back into one result per illustration
+        illust_results = []
+        offset = 0
+        for illust, count in zip(illustrations, owners):
+            illust_results.append(self._illustration_result(illust, results[offset:offset + count]))
+            offset += count
 
-        Args:
-            illust: Illustration dictionary
+        stats = Counter(illust_results)
+        stats['total'] = len(illustrations)
+        return stats
 
-        Returns:
-            'success', 'failed', or 'skipped'
-        """
+    def _illustration_result(self, illust: Dict, page_results: List) -> str:
+        """Reduce the per-page results of one illustration to 'success' or 'failed'"""
         illust_id = illust.get('id')
-        title = illust.get('title', 'unknown').replace('/', '_').replace('\\', '_').replace(':', '_')
-        page_count = illust.get('page_count', 1)
-        urls = illust.get('original_urls', [])
 
-        if not urls:
-            self.logger.warning(f"No image URLs found for illustration {illust_id}")
+        failed = 0
+        for idx, result in enumerate(page_results):
+            if isinstance(result, Exception):
+                self.logger.warning("Failed to download image %d of illustration %s: %s: %s",
+                                    idx + 1, illust_id, type(result).__name__, result)
+                failed += 1
+
+        if not page_results or failed or len(page_results) < illust.get('page_count', 1):
             return 'failed'
 
-        # Download directly to output_dir without creating subdirectories
-        success_count = 0
-
-        for idx, url in enumerate(urls[:page_count]):
-            try:
-                # Use title as filename (with page number for multi-page illustrations)
-                if page_count > 1:
-                    filename = f"{title}_p{idx}.jpg"
-                else:
-                    filename = f"{title}.jpg"
-
-                file_path = self.output_dir / filename
-
-                # Skip if file already exists
-                if file_path.exists():
-                    self.logger.info(f"File already exists: {filename}")
-                    success_count += 1
-                    continue
-
-                # Download image
-                response = self.session.get(
-                    url,
-                    timeout=self.config.get('download.timeout', 30),
-                    stream=True
-                )
-                response.raise_for_status()
+        self.logger.info("Successfully downloaded illustration %s: %s", illust_id, illust.get('title', 'unknown'))
+        return 'success'
 
-                # Write file
-                with open(file_path, 'wb') as f:
-                    for chunk in response.iter_content(chunk_size=8192):
-                        if chunk:
-                            f.write(chunk)
+    async def _download_one(self, client: httpx.AsyncClient, sem: asyncio.Semaphore, limiter: AsyncLimiter,
+                            disk: ThreadPoolExecutor, url: str, file_path: Path) -> str:
+        """Stream a single image to disk, bounded by the shared semaphore and rate limiter"""
+        filename = file_path.name
+        key = _name_key(filename)
 
-                self.logger.info(f"Downloaded: {filename}")
-                success_count += 1
-                time.sleep(self.config.get('download.delay', 1.0))
+        # Skip if file already exists
+        if key in self._existing:
+            self.logger.info("File already exists: %s", filename)
+            return 'success'
 
-            except Exception as e:
-                self.logger.warning(f"Failed to download image {idx + 1} of illustration {illust_id}: {e}")
+        # Claim the name before the first await, so a same-named target
+        # running concurrently is skipped instead of writing the same file
+        self._existing.add(key)
+        opened = False
+        try:
+            async with sem, limiter:
+                async with client.stream('GET', url) as response:
+                    response.raise_for_status()
+
+                    async with aiofiles.open(file_path, 'wb', executor=disk) as f:
+                        opened = True
+                        async for chunk in response.aiter_bytes(self._chunk):
+                            await f.write(chunk)
+        except BaseException:
+            # Release the name and drop the truncated file so a later run retries it
+            self._existing.discard(key)
+            if opened:
+                file_path.unlink(missing_ok=True)
+            raise
+
+        self.logger.info("Downloaded: %s", filename)
+        return 'success'
+
+    def _build_targets(self, illust: Dict) -> List[Tuple[str, Path]]:
+        """Build the (url, file path) pairs for every page of an illustration"""
+        title = (illust.get('title') or 'unknown').translate(_SANITIZE)
+        page_count = illust.get('page_count', 1)
+        urls = illust.get('original_urls', [])
 
-        if success_count == 0:
-            return 'failed'
-        elif success_count < page_count:
-            return 'failed'
+        # Use title as filename (with page number for multi-page illustrations)
+        if page_count > 1:
+            names = (f"{title}_p{idx}.jpg" for idx in range(page_count))
         else:
-            self.logger.info(f"Successfully downloaded illustration {illust_id}: {title}")
-            return 'success'
+            names = (f"{title}.jpg",)
 
-    def close(self):
-        """Close the session"""
-        self.session.close()
+        # Download directly to output_dir without creating subdirectories
+        return [(url, self.output_dir / name) for url, name in zip(urls[:page_count], names)]
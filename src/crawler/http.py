@@ -0,0 +1,157 @@
+import socket
+import time
+import requests
+from typing import Dict, List, Optional, Tuple
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+from urllib3.util.connection import allowed_gai_family
+from urllib3.util.retry import Retry
+from src.config.config import Config
+
+# Response statuses worth retrying
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Seconds resolved addresses are reused before looking the host up again
+DNS_TTL = 600
+
+# host -> (expiry, addresses)
+_dns_cache: Dict[str, Tuple[float, List[str]]] = {}
+
+
+def _resolve(host: str, port: int) -> List[str]:
+    """Resolve host to its addresses, reusing cached lookups until they expire"""
+    now = time.monotonic()
+    cached = _dns_cache.get(host)
+    if cached and cached[0] > now:
+        return cached[1]
+
+    # Same family restriction urllib3 applies when it resolves by itself
+    addresses = []
+    for _, _, _, _, sockaddr in socket.getaddrinfo(host, port, allowed_gai_family(), socket.SOCK_STREAM):
+        if sockaddr[0] not in addresses:
+            addresses.append(sockaddr[0])
+    _dns_cache[host] = (now + DNS_TTL, addresses)
+    return addresses
+
+
+class _CachedDNSMixin:
+    """Connect to cached addresses while keeping the hostname for SNI and Host"""
+
+    def _new_conn(self):
+        host = self._dns_host
+        try:
+            addresses = _resolve(host, self.port)
+        except OSError:
+            addresses = []
+        if not addresses:
+            # Let urllib3 resolve it and raise its usual error
+            return super()._new_conn()
+
+        # Try every address in turn, like urllib3's create_connection
+        error = None
+        try:
+            for address in addresses:
+                self._dns_host = address
+                try:
+                    return super()._new_conn()
+                except (NewConnectionError, ConnectTimeoutError) as e:
+                    # Look the host up again next time instead of reusing a dead address
+                    _dns_cache.pop(host, None)
+                    error = e
+        finally:
+            self._dns_host = host
+        raise error
+
+
+class _CachedDNSHTTPConnection(_CachedDNSMixin, HTTPConnection):
+    pass
+
+
+class _CachedDNSHTTPSConnection(_CachedDNSMixin, HTTPSConnection):
+    pass
+
+
+class _CachedDNSHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _CachedDNSHTTPConnection
+
+
+class _CachedDNSHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _CachedDNSHTTPSConnection
+
+
+class CachedDNSAdapter(HTTPAdapter):
+    """HTTPAdapter whose connections reuse DNS lookups for DNS_TTL seconds"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _CachedDNSHTTPConnectionPool,
+            'https': _CachedDNSHTTPSConnectionPool,
+        }
+
+
+def build_headers(config: Config) -> Dict[str, str]:
+    """Build the headers shared by every request to Pixiv"""
+    return {
+        'User-Agent': config.get('headers.user_agent', ''),
+        'Referer': 'https://www.pixiv.net',
+        'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
+    }
+
+
+def build_proxies(config: Config) -> Dict[str, str]:
+    """Build the requests-style proxy mapping from config"""
+    proxies = {}
+    if config.get('proxy.enabled', False):
+        http_proxy = config.get('proxy.http')
+        https_proxy = config.get('proxy.https')
+        if http_proxy:
+            proxies['http'] = http_proxy
+        if https_proxy:
+            proxies['https'] = https_proxy
+    return proxies
+
+
+def get_proxy(config: Config) -> Optional[str]:
+    """Get the single proxy URL used by the async clients (aiohttp searches and httpx downloads)"""
+    proxies = build_proxies(config)
+    return proxies.get('https') or proxies.get('http')
+
+
+def build_session(config: Config) -> requests.Session:
+    """
+    Build the requests session used by PixivAPI's synchronous calls
+
+    Only ranking and get_illustration_details go through this session; search
+    uses aiohttp and PixivDownloader uses its own httpx client. The session
+    keeps a connection pool, retries transient failures and caches DNS
+    lookups for DNS_TTL seconds.
+
+    Args:
+        config: Configuration instance
+
+    Returns:
+        Configured requests session
+    """
+    session = requests.Session()
+
+    adapter = CachedDNSAdapter(
+        pool_connections=32,
+        pool_maxsize=64,
+        max_retries=Retry(
+            total=config.get('download.retry_times', 3),
+            backoff_factor=0.5,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=('GET',),
+            respect_retry_after_header=True
+        )
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+
+    session.headers.update(build_headers(config))
+    session.proxies.update(build_proxies(config))
+
+    return session
@@ -1,13 +1,41 @@
 import requests
+import aiohttp
+import asyncio
 import re
-import time
-import json
-from datetime import datetime
-from typing import List, Dict, Optional
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import List, Dict, Optional, Set
 from urllib.parse import urljoin
 from src.utils.logger import Logger
 from src.config.config import Config
-from bs4 import BeautifulSoup
+from src.crawler.cache import DetailCache
+from src.crawler.http import RETRY_STATUSES, build_headers, build_session, get_proxy
+
+try:
+    import orjson as json
+except ImportError:  # Fall back to the stdlib parser
+    import json
+
+# data-id attributes of the illustration thumbnails on search pages
+_DATA_ID_RE = re.compile(rb'data-id="(\d+)"')
+
+# Inline <script type="application/json"> blocks embedded in Pixiv pages
+_JSON_SCRIPT_RE = re.compile(rb'<script[^>]*type=["\']application/json["\'][^>]*>(.*?)</script>', re.DOTALL)
+
+
+def _retry_delay(attempt: int, retry_after: Optional[str]) -> float:
+    """Seconds to wait before retry number attempt, preferring the server's Retry-After"""
+    if retry_after:
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            pass
+        try:
+            retry_at = parsedate_to_datetime(retry_after)
+            return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+        except (TypeError, ValueError):
+            pass
+    return min(0.5 * 2 ** (attempt - 1), 120.0)
 
 
 class PixivAPI:
@@ -16,39 +44,40 @@ class PixivAPI:
     BASE_URL = "https://www.pixiv.net"
     AJAX_URL = "https://www.pixiv.net/ajax"
     RANKING_URL = "https://www.pixiv.net/ranking.php"
+    ACCEPT = 'application/json, text/javascript, */*; q=0.01'
 
-    def __init__(self, config: Config):
+    def __init__(self, config: Config, session: Optional[requests.Session] = None):
         self.config = config
         self.logger = Logger()
-        self.session = requests.Session()
-        self._setup_session()
-
-    def _setup_session(self):
-        """Setup requests session with headers and proxies"""
-        headers = {
-            'User-Agent': self.config.get('headers.user_agent', ''),
-            'Referer': self.BASE_URL,
-            'Accept': 'application/json, text/javascript, */*; q=0.01',
-            'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
-        }
-        self.session.headers.update(headers)
-
-        # Setup proxy if enabled
-        if self.config.get('proxy.enabled', False):
-            http_proxy = self.config.get('proxy.http')
-            https_proxy = self.config.get('proxy.https')
-            if http_proxy or https_proxy:
-                proxies = {}
-                if http_proxy:
-                    proxies['http'] = http_proxy
-                if https_proxy:
-                    proxies['https'] = https_proxy
-                self.session.proxies.update(proxies)
+        self._owns_session = session is None
+        self.session = session or build_session(config)
+        self.headers = {**build_headers(config), 'Accept': self.ACCEPT}
+        self._proxy = get_proxy(config)
+        self._timeout = config.get('download.timeout', 30)
+        self._delay = config.get('download.delay', 1.0)
+        self._retries = config.get('download.retry_times', 3)
+        self.cache: Optional[DetailCache] = None
+        if config.get('cache.enabled', True):
+            self.cache = DetailCache(config.get('cache.path', 'cache.db'), config.get('cache.ttl', 86400))
 
     def search(self, keyword: str, max_pages: int = 10, order: str = 'date_d') -> List[Dict]:
         """
         Search illustrations by keyword
 
+        Args:
+            keyword: Search keyword
+            max_pages: Maximum number of pages to fetch
+            order: Order type (date_d: newest, popular_d: most popular, etc.)
+
+        Returns:
+            List of illustration data
+        """
+        return asyncio.run(self.search_async(keyword, max_pages=max_pages, order=order))
+
+    async def search_async(self, keyword: str, max_pages: int = 10, order: str = 'date_d') -> List[Dict]:
+        """
+        Search illustrations by keyword, fetching the details of each result page concurrently
+
         Args:
             keyword: Search keyword
             max_pages: Maximum number of pages to fetch
@@ -58,61 +87,140 @@ class PixivAPI:
             List of illustration data
         """
         illustrations = []
-        retry_count = 0
-        max_retries = self.config.get('download.retry_times', 3)
+        seen: Set[int] = set()
+        stale_pages = 0
 
-        for page in range(1, max_pages + 1):
-            try:
-                self.logger.info(f"Fetching search results - keyword: {keyword}, page: {page}")
-
-                # Construct search URL
-                url = f"{self.BASE_URL}/search/illustrations"
-                params = {
-                    's_mode': 's_tag_full',
-                    'word': keyword,
-                    'order': order,
-                    'p': page,
-                    'type': 'all'
-                }
-
-                response = self.session.get(url, params=params, timeout=self.config.get('download.timeout', 30))
-                response.raise_for_status()
-
-                # Extract illustration IDs from the response HTML
-                illust_ids = self._extract_illust_ids(response.text)
-
-                if not illust_ids:
-                    self.logger.warning(f"No illustrations found on page {page}")
-                    break
+        sem = asyncio.Semaphore(self.config.get('download.concurrency', 10))
+        timeout = aiohttp.ClientTimeout(total=self._timeout)
+        connector = aiohttp.TCPConnector(limit=32, limit_per_host=16, use_dns_cache=True, ttl_dns_cache=600)
 
-                # Fetch details for each illustration
-                for illust_id in illust_ids:
-                    try:
-                        illust_data = self.get_illustration_details(illust_id)
-                        if illust_data:
-                            illustrations.append(illust_data)
-                            time.sleep(self.config.get('download.delay', 1.0))
-                    except Exception as e:
-                        self.logger.warning(f"Failed to get details for illust_id {illust_id}: {e}")
-
-                # Add delay between pages
-                time.sleep(self.config.get('download.delay', 1.0) * 2)
-                retry_count = 0  # Reset retry count on success
-
-            except requests.exceptions.RequestException as e:
-                retry_count += 1
-                if retry_count < max_retries:
-                    self.logger.warning(f"Request failed (retry {retry_count}/{max_retries}): {e}")
-                    time.sleep(2 ** retry_count)  # Exponential backoff
-                else:
-                    self.logger.error(f"Failed to fetch page {page} after {max_retries} retries: {e}")
+        async with aiohttp.ClientSession(connector=connector, headers=self.headers, timeout=timeout) as session:
+            for page in range(1, max_pages + 1):
+                try:
+                    self.logger.info(f"Fetching search results - keyword: {keyword}, page: {page}")
+
+                    # Construct search URL
+                    url = f"{self.BASE_URL}/search/illustrations"
+                    params = {
+                        's_mode': 's_tag_full',
+                        'word': keyword,
+                        'order': order,
+                        'p': page,
+                        'type': 'all'
+                    }
+
+                    html = await self._get_async(session, sem, url, params=params)
+
+                    # Extract illustration IDs from the response HTML
+                    illust_ids = self._extract_illust_ids(html)
+
+                    if not illust_ids:
+                        self.logger.warning(f"No illustrations found on page {page}")
+                        break
+
+                    # Skip IDs already fetched from earlier pages
+                    new_ids = [i for i in illust_ids if i not in seen]
+                    seen.update(new_ids)
+
+                    if not new_ids:
+                        stale_pages += 1
+                        if stale_pages >= 2:
+                            self.logger.info(f"No new illustrations on the last {stale_pages} pages, stopping")
+                            break
+                        continue
+                    stale_pages = 0
+
+                    # Fetch details for every new illustration on this page at once
+                    results = await asyncio.gather(
+                        *(self._fetch_detail_async(session, sem, illust_id) for illust_id in new_ids)
+                    )
+                    illustrations.extend(illust_data for illust_data in results if illust_data)
+
+                    # Add delay between pages
+                    await asyncio.sleep(self._delay * 2)
+
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    self.logger.error(f"Failed to fetch page {page}: {e}")
+                    break
+                except Exception as e:
+                    self.logger.error(f"Unexpected error while fetching page {page}: {e}")
                     break
-            except Exception as e:
-                self.logger.error(f"Unexpected error while fetching page {page}: {e}")
-                break
 
         return illustrations
 
+    async def _get_async(self, session: aiohttp.ClientSession, sem: asyncio.Semaphore,
+                         url: str, **kwargs) -> bytes:
+        """
+        GET a URL and return the body, retrying transient failures
+
+        Mirrors the urllib3 Retry policy of the requests session:
+        connection errors, timeouts and RETRY_STATUSES are retried up to
+        download.retry_times with exponential backoff, honouring Retry-After.
+        """
+        attempt = 0
+        while True:
+            retry_after = None
+            try:
+                async with sem, session.get(url, proxy=self._proxy, **kwargs) as response:
+                    if response.status not in RETRY_STATUSES or attempt >= self._retries:
+                        response.raise_for_status()
+                        return await response.read()
+                    retry_after = response.headers.get('Retry-After')
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if attempt >= self._retries:
+                    raise
+
+            attempt += 1
+            # Sleep outside the semaphore so other requests can proceed
+            await asyncio.sleep(_retry_delay(attempt, retry_after))
+
+    async def _fetch_detail_async(self, session: aiohttp.ClientSession, sem: asyncio.Semaphore,
+                                  illust_id: int) -> Optional[Dict]:
+        """Async counterpart of get_illustration_details"""
+        cached = self._get_cached_details(illust_id)
+        if cached:
+            return cached
+
+        try:
+            url = f"{self.AJAX_URL}/illusts/{illust_id}"
+            data = json.loads(await self._get_async(session, sem, url))
+
+            if data.get('error'):
+                self.logger.warning("API error for illust_id %s: %s", illust_id, data.get('message'))
+                return None
+
+            illust_data = data.get('body', {})
+            page_count = illust_data.get('pageCount', 1)
+
+            # Single-page works already carry their original URL
+            if page_count <= 1:
+                original_urls = self._single_page_urls(illust_data)
+            else:
+                original_urls = await self._fetch_pages_async(session, sem, illust_id)
+            details = self._build_illust_data(illust_id, illust_data, original_urls)
+            self._store_cached_details(illust_id, details)
+            return details
+
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.logger.error("Failed to fetch details for illust_id %s: %s", illust_id, e)
+            return None
+        except Exception as e:
+            self.logger.error("Error parsing illustration details: %s", e)
+            return None
+
+    async def _fetch_pages_async(self, session: aiohttp.ClientSession, sem: asyncio.Semaphore,
+                                 illust_id: int) -> List[str]:
+        """Async counterpart of _get_all_image_urls"""
+        try:
+            url = f"{self.AJAX_URL}/illusts/{illust_id}/pages"
+            data = json.loads(await self._get_async(session, sem, url))
+
+            return self._parse_image_urls(data)
+
+        except Exception as e:
+            self.logger.warning("Failed to fetch all image URLs for illust_id %s: %s", illust_id, e)
+            return []
+
     def get_illustration_details(self, illust_id: int) -> Optional[Dict]:
         """
         Get detailed information about an illustration
@@ -123,66 +231,101 @@ class PixivAPI:
         Returns:
             Dictionary containing illustration details
         """
+        cached = self._get_cached_details(illust_id)
+        if cached:
+            return cached
+
         try:
             url = f"{self.AJAX_URL}/illusts/{illust_id}"
-            response = self.session.get(url, timeout=self.config.get('download.timeout', 30))
+            response = self.session.get(url, headers={'Accept': self.ACCEPT}, timeout=self._timeout)
             response.raise_for_status()
 
-            data = response.json()
+            data = json.loads(response.content)
 
             if data.get('error'):
-                self.logger.warning(f"API error for illust_id {illust_id}: {data.get('message')}")
+                self.logger.warning("API error for illust_id %s: %s", illust_id, data.get('message'))
                 return None
 
             illust_data = data.get('body', {})
+            page_count = illust_data.get('pageCount', 1)
 
-            # Extract important fields
-            return {
-                'id': illust_id,
-                'title': illust_data.get('title', 'Unknown'),
-                'artist': illust_data.get('userName', 'Unknown'),
-                'artist_id': illust_data.get('userId', ''),
-                'image_url': illust_data.get('urls', {}).get('original', ''),
-                'page_count': illust_data.get('pageCount', 1),
-                'like_count': illust_data.get('likeCount', 0),
-                'comment_count': illust_data.get('commentCount', 0),
-                'view_count': illust_data.get('viewCount', 0),
-                'upload_date': illust_data.get('uploadDate', ''),
-                'tags': [tag.get('tag', '') for tag in illust_data.get('tags', {}).get('tags', [])],
-                'original_urls': self._get_all_image_urls(illust_id, illust_data.get('pageCount', 1))
-            }
+            # Single-page works already carry their original URL
+            if page_count <= 1:
+                original_urls = self._single_page_urls(illust_data)
+            else:
+                original_urls = self._get_all_image_urls(illust_id, page_count)
+            details = self._build_illust_data(illust_id, illust_data, original_urls)
+            self._store_cached_details(illust_id, details)
+            return details
 
         except requests.exceptions.RequestException as e:
-            self.logger.error(f"Failed to fetch details for illust_id {illust_id}: {e}")
+            self.logger.error("Failed to fetch details for illust_id %s: %s", illust_id, e)
             return None
         except Exception as e:
-            self.logger.error(f"Error parsing illustration details: {e}")
+            self.logger.error("Error parsing illustration details: %s", e)
             return None
 
+    def _get_cached_details(self, illust_id: int) -> Optional[Dict]:
+        """Look up illustration details in the on-disk cache"""
+        if self.cache is None:
+            return None
+        return self.cache.get(illust_id)
+
+    def _store_cached_details(self, illust_id: int, details: Dict):
+        """Save illustration details to the on-disk cache"""
+        # Don't keep results whose image URLs failed to load
+        if self.cache is not None and details['original_urls']:
+            self.cache.put(illust_id, details)
+
+    def _build_illust_data(self, illust_id: int, illust_data: Dict, original_urls: List[str]) -> Dict:
+        """Extract the important fields from an illustration detail payload"""
+        return {
+            'id': illust_id,
+            'title': illust_data.get('title', 'Unknown'),
+            'artist': illust_data.get('userName', 'Unknown'),
+            'artist_id': illust_data.get('userId', ''),
+            'image_url': illust_data.get('urls', {}).get('original', ''),
+            'page_count': illust_data.get('pageCount', 1),
+            'like_count': illust_data.get('likeCount', 0),
+            'comment_count': illust_data.get('commentCount', 0),
+            'view_count': illust_data.get('viewCount', 0),
+            'upload_date': illust_data.get('uploadDate', ''),
+            'tags': [tag.get('tag', '') for tag in illust_data.get('tags', {}).get('tags', [])],
+            'original_urls': original_urls
+        }
+
+    def _single_page_urls(self, illust_data: Dict) -> List[str]:
+        """Get the original image URL of a single-page illustration"""
+        original_url = illust_data.get('urls', {}).get('original', '')
+        return [original_url] if original_url else []
+
     def _get_all_image_urls(self, illust_id: int, page_count: int) -> List[str]:
         """Get all image URLs for multi-page illustrations"""
-        urls = []
-
         try:
             url = f"{self.AJAX_URL}/illusts/{illust_id}/pages"
-            response = self.session.get(url, timeout=self.config.get('download.timeout', 30))
+            response = self.session.get(url, headers={'Accept': self.ACCEPT}, timeout=self._timeout)
             response.raise_for_status()
 
-            data = response.json()
-            pages = data.get('body', [])
-
-            for page in pages:
-                img_urls = page.get('urls', {})
-                original_url = img_urls.get('original', '')
-                if original_url:
-                    urls.append(original_url)
-
-            return urls
+            data = json.loads(response.content)
+            return self._parse_image_urls(data)
 
         except Exception as e:
-            self.logger.warning(f"Failed to fetch all image URLs for illust_id {illust_id}: {e}")
+            self.logger.warning("Failed to fetch all image URLs for illust_id %s: %s", illust_id, e)
             return []
 
+    def _parse_image_urls(self, data: Dict) -> List[str]:
+        """Collect original image URLs from a /pages payload"""
+        urls = []
+        pages = data.get('body', [])
+
+        for page in pages:
+            img_urls = page.get('urls', {})
+            original_url = img_urls.get('original', '')
+            if original_url:
+                urls.append(original_url)
+
+        return urls
+
     def ranking(self, mode: str = 'monthly', date: Optional[str] = None) -> List[Dict]:
         """
         Get illustrations from Pixiv ranking by parsing HTML img URLs directly
@@ -196,8 +339,6 @@ class PixivAPI:
             List of illustration data with img URLs from ranking page
         """
         illustrations = []
-        retry_count = 0
-        max_retries = self.config.get('download.retry_times', 3)
 
         if not date:
             date = datetime.now().strftime('%Y%m%d')
@@ -215,57 +356,56 @@ class PixivAPI:
             response = self.session.get(
                 self.RANKING_URL,
                 params=params,
-                timeout=self.config.get('download.timeout', 30)
+                headers={'Accept': self.ACCEPT},
+                timeout=self._timeout
             )
             response.raise_for_status()
 
             # Extract illustration data directly from ranking page JSON
-            illustrations = self._extract_ranking_illustrations(response.text)
+            illustrations = self._extract_ranking_illustrations(response.content)
 
             if not illustrations:
                 self.logger.warning(f"No illustrations found in ranking")
                 return []
 
             self.logger.info(f"Found {len(illustrations)} illustrations in ranking")
-            retry_count = 0
 
         except requests.exceptions.RequestException as e:
-            retry_count += 1
-            if retry_count < max_retries:
-                self.logger.warning(f"Request failed (retry {retry_count}/{max_retries}): {e}")
-                time.sleep(2 ** retry_count)
-            else:
-                self.logger.error(f"Failed to fetch ranking after {max_retries} retries: {e}")
+            # Transient failures were already retried by the session's adapter
+            self.logger.error(f"Failed to fetch ranking: {e}")
         except Exception as e:
             self.logger.error(f"Unexpected error while fetching ranking: {e}")
 
         return illustrations
 
-    def _extract_illust_ids(self, html: str) -> List[int]:
+    def _extract_illust_ids(self, html: bytes) -> List[int]:
         """Extract illustration IDs from search results HTML"""
         try:
             # Look for data-id attributes in image elements
-            pattern = r'data-id="(\d+)"'
-            ids = re.findall(pattern, html)
-            return list(set(map(int, ids)))[:100]  # Limit to 100 unique IDs
+            ids = _DATA_ID_RE.findall(html)
+            return list({int(x) for x in ids})[:100]  # Limit to 100 unique IDs
         except Exception as e:
             self.logger.error(f"Error extracting illustration IDs: {e}")
             return []
 
-    def _extract_ranking_illustrations(self, html: str) -> List[Dict]:
+    def _extract_ranking_illustrations(self, html: bytes) -> List[Dict]:
         """Extract illustration data from ranking page JSON"""
         try:
-            soup = BeautifulSoup(html, 'html.parser')
+            # Use the first JSON script tag that carries the page props
+            json_data = None
+            for match in _JSON_SCRIPT_RE.finditer(html):
+                try:
+                    payload = json.loads(match.group(1))
+                except ValueError:
+                    continue
+                if isinstance(payload, dict) and 'props' in payload:
+                    json_data = payload
+                    break
 
-            # Find JSON script tag
-            script = soup.find('script', type='application/json')
-            if not script:
+            if json_data is None:
                 self.logger.warning("No JSON script tag found")
                 return []
 
-            # Parse JSON data
-            json_data = json.loads(script.string)
-
             # Extract illustration data from JSON
             # Path: props > pageProps > assign > contents
             contents = (
@@ -302,19 +442,19 @@ class PixivAPI:
                     }
                     illustrations.append(illust_data)
                 except Exception as e:
-                    self.logger.warning(f"Failed to process ranking content: {e}")
+                    self.logger.warning("Failed to process ranking content: %s", e)
                     continue
 
             self.logger.info(f"Extracted {len(illustrations)} illustrations from ranking page")
             return illustrations
 
-        except json.JSONDecodeError as e:
-            self.logger.error(f"Error parsing JSON data: {e}")
-            return []
         except Exception as e:
             self.logger.error(f"Error extracting ranking illustrations: {e}")
             return []
 
     def close(self):
-        """Close the session"""
-        self.session.close()
+        """Close the detail cache, and the session if it is not shared"""
+        if self.cache is not None:
+            self.cache.close()
+        if self._owns_session:
+            self.session.close()
@@ -91,7 +91,6 @@ def cmd_search(args, config: Config):
         downloader = PixivDownloader(config)
         logger.info("Starting download...")
         stats = downloader.download_illustrations(illustrations)
-        downloader.close()
 
         # Print statistics
         print("\n" + "="*50)
@@ -137,7 +136,6 @@ def cmd_ranking(args, config: Config):
         downloader = PixivDownloader(config)
         logger.info("Starting download...")
         stats = downloader.download_illustrations(illustrations)
-        downloader.close()
 
         # Print statistics
         print("\n" + "="*50)
@@ -1,4 +1,5 @@
 import logging
+import logging.handlers
 import os
 from datetime import datetime
 
@@ -45,8 +46,12 @@ class Logger:
         )
         file_handler.setFormatter(file_formatter)
 
+        # Buffer file records and flush them in batches (or right away on errors)
+        memory_handler = logging.handlers.MemoryHandler(capacity=1024, target=file_handler)
+        memory_handler.setLevel(logging.DEBUG)
+
         logger.addHandler(console_handler)
-        logger.addHandler(file_handler)
+        logger.addHandler(memory_handler)
 
         Logger._logger = logger
 
@@ -58,17 +63,25 @@ class Logger:
         return Logger._logger
 
     @staticmethod
-    def info(message):
-        Logger.get_logger().info(message)
+    def info(message, *args):
+        logger = Logger.get_logger()
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(message, *args)
 
     @staticmethod
-    def error(message):
-        Logger.get_logger().error(message)
+    def error(message, *args):
+        logger = Logger.get_logger()
+        if logger.isEnabledFor(logging.ERROR):
+            logger.error(message, *args)
 
     @staticmethod
-    def warning(message):
-        Logger.get_logger().warning(message)
+    def warning(message, *args):
+        logger = Logger.get_logger()
+        if logger.isEnabledFor(logging.WARNING):
+            logger.warning(message, *args)
 
     @staticmethod
-    def debug(message):
-        Logger.get_logger().debug(message)
+    def debug(message, *args):
+        logger = Logger.get_logger()
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(message, *args)